@@ -3,85 +3,133 @@ import time
 import sys
 
 class SerialController:
-    def __init__(self, port='/dev/cu.usbserial-0001', baudrate=9600, timeout=1):
+    # Upper bound on readline() calls per command (each waits at most `timeout`)
+    _MAX_READS = 5
+    # Wire-format commands, encoded once instead of on every call
+    _LED_ON_CMD = b'led on\n'
+    _LED_OFF_CMD = b'led off\n'
+    _STATUS_CMD = b'status\n'
+    # Longest wait for the device to come up after the port opens (auto-reset)
+    _READY_TIMEOUT = 2.0
+    # Gap between readiness probes, since a rebooting board drops what it receives
+    _PROBE_INTERVAL = 0.25
+    
+    def __init__(self, port='/dev/cu.usbserial-0001', baudrate=9600, timeout=0.05):
         """
         Initialize serial connection
         Args:
             port: Serial port (on Mac, typically /dev/cu.usbserial-* or /dev/cu.usbmodem*)
             baudrate: Communication speed
-            timeout: Read timeout in seconds
+            timeout: Per-readline timeout in seconds
         """
+        # Set when a command got no answer in time, so its reply may still arrive
+        self._reply_overdue = False
         try:
             self.serial_port = serial.Serial(port, baudrate, timeout=timeout)
-            time.sleep(2)  # Wait for connection to establish
+            if not self._wait_until_ready():
+                print(f"No answer from {port} yet, continuing anyway")
+            # Drop boot output and probe replies once. A probe sent just
+            # before the first answer is replied to within a probe interval
+            self._drain(self._PROBE_INTERVAL)
             print(f"Connected to {port} at {baudrate} baud")
         except serial.SerialException as e:
             print(f"Error connecting to serial port: {e}")
             sys.exit(1)
     
+    def _wait_until_ready(self):
+        """
+        Probe the device until it answers, instead of sleeping through a
+        possible auto-reset
+        Returns:
+            True if the device answered within _READY_TIMEOUT
+        """
+        deadline = time.monotonic() + self._READY_TIMEOUT
+        next_probe = 0.0
+        while time.monotonic() < deadline:
+            if time.monotonic() >= next_probe:
+                self.serial_port.write(self._STATUS_CMD)  # Read-only, safe to repeat
+                next_probe = time.monotonic() + self._PROBE_INTERVAL
+            # Any output (boot banner or probe reply) means the firmware is up
+            if self.serial_port.readline().strip():
+                return True
+        return False
+    
+    def _drain(self, quiet):
+        """
+        Read and discard input until the line has been silent for `quiet`
+        seconds, giving up after _READY_TIMEOUT
+        """
+        now = time.monotonic()
+        deadline = now + self._READY_TIMEOUT
+        quiet_until = now + quiet
+        while time.monotonic() < min(quiet_until, deadline):
+            if self.serial_port.readline():
+                quiet_until = time.monotonic() + quiet
+    
     def send_command(self, command):
         """
         Send command to serial device and return response
         Args:
-            command: Command string to send
+            command: Command string, or newline-terminated bytes, to send
         Returns:
             Response string from device
         """
+        if isinstance(command, str):
+            command = (command + '\n').encode('utf-8')
+        sent = command.decode('utf-8').strip()
         try:
-            # Clear input and output buffers
-            self.serial_port.flushInput()
-            self.serial_port.flushOutput()
-            
-            # Send command with newline
-            command_bytes = (command + '\n').encode('utf-8')
-            self.serial_port.write(command_bytes)
-            print(f"Sent: {command}")
-            
-            # Wait a bit longer for response
-            time.sleep(0.2)
-            
-            # Read all available responses
-            responses = []
-            while self.serial_port.in_waiting > 0:
-                line = self.serial_port.readline().decode('utf-8').strip()
-                if line:  # Only add non-empty lines
-                    responses.append(line)
-                    print(f"Received: {line}")
+            # A reply that missed the previous read window would be taken as
+            # this command's answer, so drop it before writing
+            if self._reply_overdue:
+                # It may still be in flight; wait out one more read window
+                self._drain(self._MAX_READS * self.serial_port.timeout)
+                self._reply_overdue = False
+            if self.serial_port.in_waiting:  # One ioctl, no flush when empty
+                self.serial_port.reset_input_buffer()
+            self.serial_port.write(command)
+            print(f"Sent: {sent}")
             
-            # Filter responses to get the actual device response
-            for response in responses:
-                # Skip echo, prompt characters, and empty responses
-                if (response.lower() != command.lower() and 
-                    response not in ['>', '$', '#'] and  # Common prompt characters
-                    len(response) > 1):
-                    return response
+            # readline() returns as soon as a newline arrives, or after the
+            # short per-read timeout, so we never sleep longer than needed
+            pending = b''
+            for _ in range(self._MAX_READS):
+                pending += self.serial_port.readline()
+                if not pending.endswith(b'\n'):
+                    continue  # Nothing yet, or timed out mid-line
+                line = pending.decode('utf-8').strip()
+                pending = b''
+                if not line:
+                    continue
+                print(f"Received: {line}")
+                
+                # Skip echo (sent back verbatim) and single-character
+                # prompts such as '>', '$' or '#'
+                if line != sent and len(line) > 1:
+                    return line
             
-            # If no valid response found, try the delayed read approach
-            if len(responses) >= 1 and responses[0].lower() == command.lower():
-                time.sleep(0.1)
-                if self.serial_port.in_waiting > 0:
-                    actual_response = self.serial_port.readline().decode('utf-8').strip()
-                    if actual_response and actual_response not in ['>', '$', '#']:
-                        print(f"Received (delayed): {actual_response}")
-                        return actual_response
-        
+            self._reply_overdue = True
             return None  # No valid response received
             
         except Exception as e:
-            print(f"Error sending command '{command}': {e}")
+            print(f"Error sending command '{sent}': {e}")
+            try:
+                # Discard any half-read response so the next command starts clean
+                self.serial_port.reset_input_buffer()
+            except Exception:
+                pass
             return None
     
     def led_on(self):
         """Turn LED on and return response"""
-        return self.send_command("led on")
+        return self.send_command(self._LED_ON_CMD)
     
     def led_off(self):
         """Turn LED off and return response"""
-        return self.send_command("led off")
+        return self.send_command(self._LED_OFF_CMD)
     
     def get_status(self):
         """Get device status and return response"""
-        return self.send_command("status")
+        return self.send_command(self._STATUS_CMD)
     
     def close(self):
         """Close serial connection"""
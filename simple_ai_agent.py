@@ -1,11 +1,147 @@
+import asyncio
+import httpx
+import json
 import ollama
+import os
 import re
+import sys
+import threading
 from serial_controller import SerialController
 
+INTENTS = ("LED_ON", "LED_OFF", "STATUS", "UNKNOWN")
+
+# Every call here is a short classification, so a small 4-bit model is enough
+# (Ollama's llama3.2 tag is the 3B Q4_K_M build)
+DEFAULT_MODEL = "llama3.2"
+
+# Keep the model resident between turns so think-time never triggers a reload
+KEEP_ALIVE = "24h"
+# Runtime knobs the host can tune, e.g. OLLAMA_OPT_NUM_THREAD=8; unset ones keep Ollama's defaults
+RUNTIME_OPTIONS = ("num_thread", "num_gpu", "num_batch")
+
+def runtime_options():
+    """Read Ollama runtime overrides from OLLAMA_OPT_* environment variables"""
+    options = {}
+    for name in RUNTIME_OPTIONS:
+        variable = f"OLLAMA_OPT_{name.upper()}"
+        value = os.environ.get(variable)
+        if not value:
+            continue
+        try:
+            options[name] = int(value)
+        except ValueError:
+            print(f"⚠️  Ignoring {variable}={value!r}: expected an integer")
+    return options
+
+# A small context is plenty for the classifier prompt and keeps the KV cache small.
+# Every call shares these, since changing num_ctx or the runtime knobs reloads the model
+CLASSIFY_OPTIONS = {"temperature": 0, "num_ctx": 512, "num_predict": 80, **runtime_options()}
+# Fail fast if Ollama is not running; the read timeout still covers a cold model load
+OLLAMA_TIMEOUT = httpx.Timeout(120.0, connect=2.0)
+
+# Hoisted so every turn sends a byte-identical prefix, letting Ollama reuse its KV cache
+_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": """You are a friendly AI assistant controlling an LED device.
+Analyze the user input and respond with a JSON object of the form
+{"intent": "...", "reply_template": "..."} where intent is exactly one of:
+- "LED_ON" if user wants to turn on/enable/activate the LED
+- "LED_OFF" if user wants to turn off/disable/deactivate the LED
+- "STATUS" if user wants to check status/state/condition
+- "UNKNOWN" if unclear or unrelated
+
+reply_template is a brief, natural and friendly reply to the user that
+contains the placeholder {result} exactly once. {result} will be replaced
+with the outcome of the command sent to the device.
+
+Examples:
+"please turn on the led" -> {"intent": "LED_ON", "reply_template": "Sure! {result}"}
+"what's the status?" -> {"intent": "STATUS", "reply_template": "Here you go: {result}"}
+"hello" -> {"intent": "UNKNOWN", "reply_template": "{result}"}
+
+Respond with only the JSON object, nothing else.""",
+}
+
+# Upper bound on queued inputs classified per call, to stay within num_ctx
+MAX_BATCH = 8
+_BATCH_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": """You classify commands for an LED device.
+The user sends several numbered lines, one command per line. Respond with a
+JSON object {"intents": [...]} listing one intent per line, in order, each
+exactly one of:
+- "LED_ON" if the line asks to turn on/enable/activate the LED
+- "LED_OFF" if the line asks to turn off/disable/deactivate the LED
+- "STATUS" if the line asks for the status/state/condition
+- "UNKNOWN" if unclear or unrelated
+
+Example:
+"0: light it up\n1: is it on?" -> {"intents": ["LED_ON", "STATUS"]}
+
+Respond with only the JSON object, nothing else.""",
+}
+
+# Fast-path classifier for unambiguous commands, so they skip the LLM entirely.
+# A misfire switches real hardware, so the LED noun must sit inside the verb phrase
+_LED_NOUN = r"(?:the\s+)?(?:led|light)s?"
+_INTENT_RE = re.compile(
+    rf"(?P<LED_ON>\b(?:turn|switch)\s+(?:on\s+{_LED_NOUN}|{_LED_NOUN}\s+on)\b"
+    rf"|\b(?:enable|activate)\s+{_LED_NOUN}\b)"
+    rf"|(?P<LED_OFF>\b(?:turn|switch)\s+(?:off\s+{_LED_NOUN}|{_LED_NOUN}\s+off)\b"
+    rf"|\b(?:disable|deactivate)\s+{_LED_NOUN}\b)"
+    r"|(?P<STATUS>\bstatus\b)"
+    r"|(?P<STATUS_HINT>\b(?:check|state|condition)\b)",
+    re.IGNORECASE,
+)
+# Words that ask for a switch; more than one means a compound request
+_ACTION_RE = re.compile(r"\b(?:on|off|enable|activate|disable|deactivate)\b", re.IGNORECASE)
+_DEVICE_RE = re.compile(r"\b(?:led|light|device|board)s?\b", re.IGNORECASE)
+# Any n't contraction (either apostrophe, or none for the common ones) or plain negation
+_NEGATION_RE = re.compile(
+    r"\b\w+n['’]t\b"
+    r"|\b(?:dont|doesnt|didnt|wont|cant|shouldnt|wouldnt|couldnt|isnt|arent|not|never|no)\b",
+    re.IGNORECASE,
+)
+# A question or condition ahead of the switch verb asks about it rather than for it
+_LEAD_IN_RE = re.compile(r"\b(?:how|what|why|if|should|when)\b", re.IGNORECASE)
+# Picks the intent out of a partially streamed JSON reply
+_STREAM_INTENT_RE = re.compile(r'"intent"\s*:\s*"([^"]*)"')
+
+def normalize_intent(intent):
+    """Map a raw model label onto one of INTENTS"""
+    intent = str(intent).strip().upper()
+    return intent if intent in INTENTS else "UNKNOWN"
+
+def match_intent(user_input):
+    """Return the intent if the input is clearly one LED command, else None"""
+    if _NEGATION_RE.search(user_input):
+        return None
+    matches = list(_INTENT_RE.finditer(user_input))
+    intents = {m.lastgroup for m in matches}
+    if "STATUS_HINT" in intents:
+        # "check", "state" or "condition" only count when the device is named
+        intents.discard("STATUS_HINT")
+        if _DEVICE_RE.search(user_input):
+            intents.add("STATUS")
+    if len(intents) != 1:
+        return None  # No match or ambiguous, let the LLM decide
+    intent = intents.pop()
+    # A switch needs exactly one action word; a status query needs none
+    actions = len(_ACTION_RE.findall(user_input))
+    if actions != (0 if intent == "STATUS" else 1):
+        return None
+    if intent != "STATUS" and _LEAD_IN_RE.search(user_input, 0, matches[0].start()):
+        return None
+    return intent
+
 class SimpleAIAgent:
-    def __init__(self, model_name="gpt-oss:20b"):
+    def __init__(self, model_name=DEFAULT_MODEL):
         self.model_name = model_name
         self.serial_controller = None
+        # Last good reply template per intent, reused on turns that skip the LLM
+        self._reply_templates = {}
+        # One long-lived client, so every call reuses the pooled HTTP connection
+        self._client = ollama.AsyncClient(timeout=OLLAMA_TIMEOUT)
         
     def initialize_serial(self, port='/dev/cu.usbmodem21102', baudrate=9600):
         """Initialize the serial controller"""
@@ -17,116 +153,240 @@ class SimpleAIAgent:
             print(f"❌ Failed to initialize serial connection: {e}")
             return False
     
-    def parse_intent(self, user_input):
-        """Parse user intent using Ollama"""
-        system_prompt = """You are an intent classifier for LED control commands. 
-        Analyze the user input and respond with exactly one of these actions:
-        - "LED_ON" if user wants to turn on/enable/activate the LED
-        - "LED_OFF" if user wants to turn off/disable/deactivate the LED  
-        - "STATUS" if user wants to check status/state/condition
-        - "UNKNOWN" if unclear or unrelated
-
-        Examples:
-        "please turn on the led" -> LED_ON
-        "turn off the light" -> LED_OFF
-        "what's the status?" -> STATUS
-        "hello" -> UNKNOWN
-
-        Respond with only the action word, nothing else."""
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_input}
-        ]
+    async def warmup(self):
+        """Load the model and prefill the system prompt ahead of the first user turn"""
+        messages = [_SYSTEM_MESSAGE, {"role": "user", "content": "ok"}]
+        try:
+            # Same num_ctx as classify_and_template, or Ollama reloads the model
+            await self._client.chat(
+                model=self.model_name,
+                messages=messages,
+                keep_alive=KEEP_ALIVE,
+                options={**CLASSIFY_OPTIONS, "num_predict": 1},
+            )
+            return True
+        except Exception as e:
+            print(f"⚠️  Failed to warm up model {self.model_name}: {e}")
+            return False
+    
+    async def classify_and_template(self, user_input, on_intent=None):
+        """
+        Classify intent and draft a reply template in a single streamed Ollama call
+        Args:
+            user_input: Text typed by the user
+            on_intent: Optional callback invoked with the intent as soon as it
+                has been decoded, before the reply template is complete
+        Returns:
+            (intent, reply_template) tuple; reply_template may be None
+        """
+        messages = [_SYSTEM_MESSAGE, {"role": "user", "content": user_input}]
         
+        intent = None
+        content = ""
         try:
-            response = ollama.chat(model=self.model_name, messages=messages)
-            return response['message']['content'].strip().upper()
+            stream = await self._client.chat(
+                model=self.model_name,
+                messages=messages,
+                format="json",
+                stream=True,
+                keep_alive=KEEP_ALIVE,
+                options=CLASSIFY_OPTIONS,
+            )
+            async for chunk in stream:
+                content += chunk['message']['content']
+                if intent is None:
+                    match = _STREAM_INTENT_RE.search(content)
+                    if match:
+                        # Report the intent early, the template is still decoding
+                        intent = normalize_intent(match.group(1))
+                        if on_intent:
+                            on_intent(intent)
+            parsed = json.loads(content)
+            if intent is None:
+                intent = normalize_intent(parsed.get("intent", "UNKNOWN"))
+            return intent, parsed.get("reply_template")
         except Exception as e:
             print(f"Error parsing intent: {e}")
-            return "UNKNOWN"
+            return intent or "UNKNOWN", None
+    
+    async def classify_batch(self, inputs):
+        """
+        Classify several queued inputs, sending the ones the regex cannot
+        settle to Ollama together in one call
+        Args:
+            inputs: List of user input strings
+        Returns:
+            List of intents aligned with inputs; None marks an input that
+            should go through chat's normal single-input path
+        """
+        intents = [match_intent(text) for text in inputs]
+        pending = [i for i, intent in enumerate(intents) if intent is None]
+        if len(pending) < 2:
+            return intents  # Nothing to amortize
+        
+        for start in range(0, len(pending), MAX_BATCH):
+            chunk = pending[start:start + MAX_BATCH]
+            numbered = "\n".join(f"{n}: {inputs[i]}" for n, i in enumerate(chunk))
+            messages = [_BATCH_SYSTEM_MESSAGE, {"role": "user", "content": numbered}]
+            try:
+                response = await self._client.chat(
+                    model=self.model_name,
+                    messages=messages,
+                    format="json",
+                    keep_alive=KEEP_ALIVE,
+                    options={**CLASSIFY_OPTIONS, "num_predict": 16 * len(chunk)},
+                )
+                labels = json.loads(response['message']['content']).get("intents")
+            except Exception as e:
+                print(f"Error parsing batch intents: {e}")
+                continue
+            if not isinstance(labels, list) or len(labels) != len(chunk):
+                continue  # Misaligned answer, classify these one by one instead
+            for i, label in zip(chunk, labels):
+                intents[i] = normalize_intent(label)
+        return intents
     
-    def execute_command(self, intent):
+    async def run_serial(self, command):
+        """Run a blocking serial command on a worker thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, command)
+    
+    async def execute_command(self, intent):
         """Execute the appropriate serial command"""
         if self.serial_controller is None:
             return "❌ Serial connection not initialized"
         
         if intent == "LED_ON":
-            response = self.serial_controller.led_on()
+            response = await self.run_serial(self.serial_controller.led_on)
             return f"✅ LED turned ON. Device response: {response}" if response else "✅ LED ON command sent"
         
         elif intent == "LED_OFF":
-            response = self.serial_controller.led_off()
+            response = await self.run_serial(self.serial_controller.led_off)
             return f"✅ LED turned OFF. Device response: {response}" if response else "✅ LED OFF command sent"
         
         elif intent == "STATUS":
-            response = self.serial_controller.get_status()
+            response = await self.run_serial(self.serial_controller.get_status)
             return f"📊 Device status: {response}" if response else "📊 Status command sent"
         
         else:
             return "❓ I didn't understand that. Try asking me to turn the LED on/off or check status."
     
-    def generate_response(self, user_input, command_result):
-        """Generate a natural language response"""
-        system_prompt = f"""You are a friendly AI assistant controlling an LED device. 
-        
-        User said: "{user_input}"
-        Command result: "{command_result}"
-        
-        Respond in a natural, conversational way. Keep it brief and friendly."""
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": "Generate a response"}
-        ]
-        
+    def format_reply(self, reply_template, command_result):
+        """Fill the reply template with the command result"""
+        if not isinstance(reply_template, str) or "{result}" not in reply_template:
+            return command_result
         try:
-            response = ollama.chat(model=self.model_name, messages=messages)
-            return response['message']['content'].strip()
-        except Exception as e:
+            return reply_template.format(result=command_result).strip()
+        except (KeyError, IndexError, ValueError):
             return command_result  # Fallback to command result
     
-    def chat(self, user_input):
-        """Main chat function"""
-        # Parse intent
-        intent = self.parse_intent(user_input)
-        print(f"🎯 Detected intent: {intent}")
+    async def chat(self, user_input, intent=None):
+        """
+        Main chat function
+        Args:
+            user_input: Text typed by the user
+            intent: Intent already settled by classify_batch, if any
+        Returns:
+            Reply string for the user
+        """
+        # Try the regex fast path, then fall back to a single LLM round-trip
+        if intent is None:
+            intent = match_intent(user_input)
+        reply_template = None
+        command = None
+        if intent is None:
+            def on_intent(streamed_intent):
+                nonlocal command
+                # Talk to the device while the model finishes the reply template
+                print(f"🎯 Detected intent: {streamed_intent}")
+                command = asyncio.create_task(self.execute_command(streamed_intent))
+            
+            intent, reply_template = await self.classify_and_template(user_input, on_intent)
         
-        # Execute command
-        command_result = self.execute_command(intent)
+        # Execute command, unless streaming already started it
+        if command is None:
+            print(f"🎯 Detected intent: {intent}")
+            command_result = await self.execute_command(intent)
+        else:
+            command_result = await command
         
-        # Generate natural response
+        # Wrap the result in the natural response
         if intent != "UNKNOWN":
-            response = self.generate_response(user_input, command_result)
-            return response
+            if isinstance(reply_template, str) and "{result}" in reply_template:
+                self._reply_templates[intent] = reply_template
+            else:
+                reply_template = self._reply_templates.get(intent)
+            return self.format_reply(reply_template, command_result)
         else:
             return command_result
     
-    def close(self):
-        """Close serial connection"""
+    async def close(self):
+        """Close serial connection and the Ollama client"""
         if self.serial_controller:
             self.serial_controller.close()
+        await self._client.close()
 
-def main():
+class StdinReader:
+    """Read stdin lines on a background thread without blocking the event loop"""
+    
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._lines = asyncio.Queue()
+        # Daemon thread so a pending read never holds up interpreter shutdown
+        threading.Thread(target=self._read, daemon=True).start()
+    
+    def _read(self):
+        for line in sys.stdin:
+            self._loop.call_soon_threadsafe(self._lines.put_nowait, line.rstrip("\n"))
+        self._loop.call_soon_threadsafe(self._lines.put_nowait, None)  # EOF
+    
+    async def readline(self, prompt=""):
+        """Print the prompt and wait for the next line"""
+        print(prompt, end="", flush=True)
+        line = await self._lines.get()
+        if line is None:
+            self._lines.put_nowait(None)  # Keep reporting EOF
+            raise EOFError
+        return line
+    
+    def drain(self):
+        """Return the lines already queued behind the last one read"""
+        lines = []
+        while not self._lines.empty():
+            line = self._lines.get_nowait()
+            if line is None:
+                self._lines.put_nowait(None)
+                break
+            lines.append(line)
+        return lines
+
+async def amain():
     print("🤖 Simple AI LED Controller")
     print("=" * 40)
+    stdin = StdinReader()
     
     # Get serial port
-    port = input("Enter serial port [/dev/cu.usbmodem21102]: ").strip()
+    port = (await stdin.readline("Enter serial port [/dev/cu.usbmodem21102]: ")).strip()
     if not port:
         port = "/dev/cu.usbmodem21102"
     
     # Get model name
-    model_name = input("Enter Ollama model [gpt-oss:20b]: ").strip()
+    model_name = (await stdin.readline(f"Enter Ollama model [{DEFAULT_MODEL}]: ")).strip()
     if not model_name:
-        model_name = "gpt-oss:20b"
+        model_name = DEFAULT_MODEL
     
     # Initialize agent
     agent = SimpleAIAgent(model_name)
     
-    if not agent.initialize_serial(port):
+    # Load the model while the serial port settles
+    warmup = asyncio.create_task(agent.warmup())
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(None, agent.initialize_serial, port):
+        warmup.cancel()
+        await agent.close()
         print("Exiting due to serial connection failure.")
         return
+    await warmup
     
     print(f"🧠 Using model: {model_name}")
     print("✅ Ready to chat!")
@@ -139,23 +399,36 @@ def main():
     
     try:
         while True:
-            user_input = input("\n🗣️  You: ").strip()
+            # Take everything typed or piped in meanwhile, so it can be batched
+            lines = [await stdin.readline("\n🗣️  You: ")] + stdin.drain()
             
-            if user_input.lower() in ['quit', 'exit', 'bye']:
-                break
+            inputs = []
+            quitting = False
+            for user_input in lines:
+                user_input = user_input.strip()
+                if user_input.lower() in ['quit', 'exit', 'bye']:
+                    quitting = True
+                    break
+                if user_input:
+                    inputs.append(user_input)
             
-            if not user_input:
-                continue
+            intents = await agent.classify_batch(inputs)
+            for user_input, intent in zip(inputs, intents):
+                print("🤖 AI: ", end="", flush=True)
+                response = await agent.chat(user_input, intent)
+                print(response)
             
-            print("🤖 AI: ", end="", flush=True)
-            response = agent.chat(user_input)
-            print(response)
-    
-    except KeyboardInterrupt:
-        print("\n\n👋 Goodbye!")
+            if quitting:
+                break
     
     finally:
-        agent.close()
+        await agent.close()
+
+def main():
+    try:
+        asyncio.run(amain())
+    except (KeyboardInterrupt, EOFError):
+        print("\n\n👋 Goodbye!")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,38 @@
+import pytest
+from simple_ai_agent import match_intent
+
+@pytest.mark.parametrize("user_input, intent", [
+    ("Please turn on the LED", "LED_ON"),
+    ("Switch on the light", "LED_ON"),
+    ("Enable the LED", "LED_ON"),
+    ("Turn off the LED", "LED_OFF"),
+    ("switch the lights off", "LED_OFF"),
+    ("Deactivate the LED", "LED_OFF"),
+    ("could you please turn off the led?", "LED_OFF"),
+    ("What's the device status?", "STATUS"),
+    ("Check the LED state", "STATUS"),
+    ("Current condition of the led?", "STATUS"),
+])
+def test_clear_commands_take_the_fast_path(user_input, intent):
+    assert match_intent(user_input) == intent
+
+@pytest.mark.parametrize("user_input", [
+    # Not tied to the LED, or more than one action
+    "turn off the tv, leave the light on",
+    "turn the led on then off",
+    "check the weather",
+    "check if the led is on",
+    # Negated
+    "don't turn on the led",
+    "you shouldn't turn off the light",
+    "why won't you turn on the led",
+    "don’t turn on the led",
+    "dont turn on the led",
+    # Asking about a switch rather than for one
+    "what happens if I turn off the led?",
+    "how do I turn on the led?",
+    # Needs the model
+    "light it up",
+])
+def test_unclear_inputs_fall_back_to_the_llm(user_input):
+    assert match_intent(user_input) is None